@@ -6,7 +6,7 @@ import datetime as _dt
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Callable, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -14,6 +14,8 @@ import statsmodels.api as sm
 from statsmodels.stats.diagnostic import het_breuschpagan
 from statsmodels.stats.outliers_influence import variance_inflation_factor
 
+from sketches import DEFAULT_K, KLLSketch
+
 
 def _to_native(obj):
     """Recursively convert numpy/pandas/python objects to JSON-serializable natives."""
@@ -42,6 +44,11 @@ def _to_native(obj):
 DATA = Path("data/nyc_median_rent.csv")
 OUT_DERIVED = Path("data/derived_summary.json")
 OUT_PAYLOAD = Path("data/viz_payload.json")
+LISTINGS = Path("data/nyc_listings.csv")
+OUT_SKETCHES = Path("data/rent_sketches.json")
+LISTINGS_CHUNKSIZE = 100_000
+DISTRIBUTION_QUANTILES = {"p10": 0.10, "p25": 0.25, "p50": 0.50, "p75": 0.75, "p90": 0.90}
+CITYWIDE = "NYC"
 APPENDIX_DIR = Path("appendix")
 OLS_REPORT = APPENDIX_DIR / "ols_report.md"
 
@@ -157,6 +164,182 @@ def compute_disparity(df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
     return disparity
 
 
+SketchKey = Tuple[str, str]
+
+
+def build_rent_sketches(
+    path: Path = LISTINGS, k: int = DEFAULT_K, chunksize: int = LISTINGS_CHUNKSIZE
+) -> Dict[SketchKey, KLLSketch]:
+    """Stream unit-level listings into one sketch per (borough, period).
+
+    The period is ``YYYY-MM`` when a ``month`` column is present, else ``YYYY``.
+    Listings are read in chunks so the raw file never sits in memory at once.
+    Rows are skipped when the borough is blank, the year is not a whole
+    number, the month (if present) is not a whole number in 1..12, or the
+    rent is non-numeric, non-finite, or non-positive.
+    """
+
+    has_month = "month" in pd.read_csv(path, comment="#", nrows=0).columns
+
+    sketches: Dict[SketchKey, KLLSketch] = {}
+    for chunk in pd.read_csv(path, comment="#", chunksize=chunksize):
+        years = pd.to_numeric(chunk["year"], errors="coerce")
+        rents = pd.to_numeric(chunk["rent"], errors="coerce")
+        mask = (
+            chunk["borough"].notna()
+            & np.isfinite(years)
+            & (years == np.floor(years))
+            & np.isfinite(rents)
+            & (rents > 0)
+        )
+        if has_month:
+            months = pd.to_numeric(chunk["month"], errors="coerce")
+            mask &= np.isfinite(months) & (months == np.floor(months)) & months.between(1, 12)
+        if not mask.any():
+            continue
+
+        periods = years[mask].astype(int).astype(str)
+        if has_month:
+            periods = periods + "-" + months[mask].astype(int).map("{:02d}".format)
+        valid = pd.DataFrame(
+            {"borough": chunk.loc[mask, "borough"].astype(str), "period": periods, "rent": rents[mask]}
+        )
+        for (borough, period), group in valid.groupby(["borough", "period"]):
+            sketches.setdefault((borough, period), KLLSketch(k=k)).update_many(group["rent"])
+    return sketches
+
+
+def rollup_sketches(
+    sketches: Dict[SketchKey, KLLSketch], key_fn: Callable[[SketchKey], SketchKey]
+) -> Dict[SketchKey, KLLSketch]:
+    """Merge sketches that share ``key_fn(key)`` without touching raw listings.
+
+    Empty sketches are skipped; sketches built with different ``k`` values
+    cannot be merged and raise ``ValueError``.
+    """
+
+    rolled: Dict[SketchKey, KLLSketch] = {}
+    for key in sorted(sketches):
+        sketch = sketches[key]
+        if sketch.n == 0:
+            continue
+        target = key_fn(key)
+        if target not in rolled:
+            rolled[target] = KLLSketch(k=sketch.k)
+        rolled[target].merge(sketch)
+    return rolled
+
+
+def summarize_sketch(sketch: KLLSketch) -> Dict[str, object]:
+    """Return the standard quantile ladder plus IQR for a non-empty sketch."""
+
+    values = sketch.quantiles(list(DISTRIBUTION_QUANTILES.values()))
+    summary: Dict[str, object] = dict(zip(DISTRIBUTION_QUANTILES, values))
+    summary["iqr"] = summary["p75"] - summary["p25"]
+    summary["n"] = sketch.n
+    return summary
+
+
+def compute_distribution_disparity(sketches: Dict[SketchKey, KLLSketch]) -> Dict[str, Dict[str, object]]:
+    """Compute per-year quantiles and IQR-based disparity from period sketches.
+
+    Between-borough metrics are ``None`` when fewer than two boroughs report.
+    """
+
+    by_borough_year = rollup_sketches(sketches, lambda key: (key[0], key[1][:4]))
+    citywide_year = rollup_sketches(by_borough_year, lambda key: (CITYWIDE, key[1]))
+
+    distribution: Dict[str, Dict[str, object]] = {}
+    for (_, year), city_sketch in sorted(citywide_year.items(), key=lambda item: item[0][1]):
+        boroughs = {
+            borough: summarize_sketch(sketch)
+            for (borough, sketch_year), sketch in sorted(by_borough_year.items())
+            if sketch_year == year
+        }
+        citywide = summarize_sketch(city_sketch)
+        medians = [summary["p50"] for summary in boroughs.values()]
+        median_spread = max(medians) - min(medians) if len(medians) >= 2 else None
+        distribution[year] = {
+            "boroughs": boroughs,
+            "citywide": citywide,
+            "median_spread": median_spread,
+            "iqr_disparity": (
+                median_spread / citywide["iqr"]
+                if median_spread is not None and citywide["iqr"]
+                else None
+            ),
+            "p90_p10_ratio": citywide["p90"] / citywide["p10"] if citywide["p10"] else None,
+        }
+    return distribution
+
+
+def sketches_payload(sketches: Dict[SketchKey, KLLSketch], sources: List[str]) -> Dict[str, object]:
+    """Serialize period-level sketches so later rollups can skip the raw listings.
+
+    ``sources`` lists every listings file that has contributed to the stored
+    history, not just the most recent one.
+    """
+
+    return {
+        "generated_at": pd.Timestamp.utcnow().isoformat() + "Z",
+        "sources": sorted(set(sources)),
+        "groups": [
+            {"borough": borough, "period": period, "sketch": sketches[(borough, period)].to_dict()}
+            for borough, period in sorted(sketches)
+        ],
+    }
+
+
+def load_rent_sketches(path: Path = OUT_SKETCHES) -> Tuple[Dict[SketchKey, KLLSketch], List[str]]:
+    """Read sketches and their contributing sources from :func:`sketches_payload` output.
+
+    Duplicate keys within the file are merged.
+    """
+
+    payload = json.loads(path.read_text(encoding="utf-8"))
+    sketches: Dict[SketchKey, KLLSketch] = {}
+    for group in payload.get("groups", []):
+        key = (str(group["borough"]), str(group["period"]))
+        sketch = KLLSketch.from_dict(group["sketch"])
+        if key in sketches:
+            sketches[key].merge(sketch)
+        else:
+            sketches[key] = sketch
+    return sketches, [str(source) for source in payload.get("sources", [])]
+
+
+def update_rent_sketches(
+    stored: Dict[SketchKey, KLLSketch], fresh: Dict[SketchKey, KLLSketch]
+) -> Dict[SketchKey, KLLSketch]:
+    """Fold freshly ingested sketches into the stored history.
+
+    Fresh data replaces whatever stored data covers the same borough and time:
+
+    * a fresh ``YYYY-MM`` sketch replaces the stored sketch for that month;
+    * a fresh ``YYYY`` sketch replaces the stored yearly sketch and every stored
+      ``YYYY-MM`` sketch for that borough-year;
+    * a fresh ``YYYY-MM`` sketch where the stored history holds a yearly
+      ``YYYY`` sketch for that borough raises ``ValueError``, since the month
+      cannot be separated from the year. Re-ingest the whole year instead.
+
+    Re-dropping the same period is therefore idempotent, and periods absent
+    from ``fresh`` are carried over untouched.
+    """
+
+    merged = dict(stored)
+    for borough, period in fresh:
+        if len(period) == 4:
+            for key in [key for key in merged if key[0] == borough and key[1][:4] == period]:
+                del merged[key]
+        elif (borough, period[:4]) in stored:
+            raise ValueError(
+                f"Cannot add monthly sketch {period} for {borough}: stored history holds a "
+                f"yearly {period[:4]} sketch. Re-ingest the full year instead."
+            )
+    merged.update(fresh)
+    return merged
+
+
 def compute_correlations(df: pd.DataFrame) -> Dict[str, float]:
     """Return Pearson correlations between rent and each feature."""
 
@@ -448,6 +631,16 @@ def main() -> None:
     latest_rows = latest_snapshot(df, latest_year)
     headlines = generate_headlines(growth, latest_rows, correlations, regression, disparity)
 
+    # Stored sketches carry the history; fresh listings only add or replace their own periods.
+    rent_sketches: Dict[SketchKey, KLLSketch] = {}
+    sketch_sources: List[str] = []
+    if OUT_SKETCHES.exists():
+        rent_sketches, sketch_sources = load_rent_sketches(OUT_SKETCHES)
+    if LISTINGS.exists():
+        rent_sketches = update_rent_sketches(rent_sketches, build_rent_sketches(LISTINGS))
+        sketch_sources.append(LISTINGS.as_posix())
+    rent_distribution = compute_distribution_disparity(rent_sketches) if rent_sketches else {}
+
     derived_payload = {
         "generated_at": pd.Timestamp.utcnow().isoformat() + "Z",
         "latest_year": latest_year,
@@ -458,6 +651,7 @@ def main() -> None:
         "correlations": correlations,
         "regression": regression.to_payload(),
         "disparity_index": disparity,
+        "rent_distribution": rent_distribution,
         "headlines": headlines,
     }
 
@@ -466,9 +660,13 @@ def main() -> None:
     write_json(OUT_DERIVED, derived_payload)
     write_json(OUT_PAYLOAD, viz_payload)
     write_ols_report(regression)
+    if LISTINGS.exists():
+        write_json(OUT_SKETCHES, sketches_payload(rent_sketches, sketch_sources))
 
     print(f"[derive] wrote {OUT_DERIVED}")
     print(f"[derive] wrote {OUT_PAYLOAD}")
+    if LISTINGS.exists():
+        print(f"[derive] wrote {OUT_SKETCHES} ({len(rent_sketches)} borough-period sketches)")
     print(f"[derive] updated {OLS_REPORT}")
 
 
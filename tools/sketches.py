@@ -0,0 +1,169 @@
+"""Mergeable KLL quantile sketches for unit-level rent distributions."""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence
+
+SKETCH_TYPE = "kll"
+DEFAULT_K = 200
+_DECAY = 2.0 / 3.0
+
+
+class KLLSketch:
+    """Streaming quantile summary with bounded memory, mergeable with bounded error.
+
+    Level ``h`` holds items that each stand for ``2**h`` raw values. When the
+    sketch exceeds its capacity, the lowest full level is sorted and every
+    other item is promoted to the next level. Compaction offsets alternate
+    instead of being drawn at random, and the offset is serialized, so the
+    same inputs yield the same artifact whether or not the sketch was reloaded.
+    Merges preserve total weight but may trigger further (lossy) compaction.
+    """
+
+    def __init__(self, k: int = DEFAULT_K) -> None:
+        if k < 8:
+            raise ValueError("KLL sketch parameter k must be at least 8")
+        self.k = k
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.compactors: List[List[float]] = [[]]
+        self._offset = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * _DECAY**depth)), 2)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.compactors)
+
+    def _compress(self) -> None:
+        """Compact levels until the retained item count fits the capacity."""
+
+        while self._size() >= self._max_size():
+            for level, items in enumerate(self.compactors):
+                if len(items) < self._capacity(level):
+                    continue
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items.sort()
+                # An odd leftover stays behind so no weight is lost.
+                keep = [items.pop()] if len(items) % 2 else []
+                self.compactors[level + 1].extend(items[self._offset :: 2])
+                self.compactors[level] = keep
+                self._offset ^= 1
+                break
+
+    def update(self, value: float) -> None:
+        """Add a single observation."""
+
+        self.update_many([value])
+
+    def update_many(self, values: Iterable[float]) -> None:
+        """Add a batch of observations, skipping NaN and infinite values."""
+
+        batch = [float(value) for value in values]
+        batch = [value for value in batch if math.isfinite(value)]
+        if not batch:
+            return
+        low, high = min(batch), max(batch)
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self.n += len(batch)
+        self.compactors[0].extend(batch)
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold ``other`` into this sketch in place and return ``self``.
+
+        Both sketches must share the same ``k``; mixing accuracy parameters
+        would silently change the error bound, so a mismatch raises.
+        """
+
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge KLL sketches with k={self.k} and k={other.k}")
+        if other.n == 0:
+            return self
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Return approximate values for each quantile in ``qs`` (0 ≤ q ≤ 1)."""
+
+        if any(q < 0 or q > 1 for q in qs):
+            raise ValueError("Quantiles must fall within [0, 1]")
+        if self.n == 0:
+            return [None for _ in qs]
+
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+        results: List[Optional[float]] = []
+        for q in qs:
+            if q == 0:
+                results.append(self.min)
+                continue
+            if q == 1:
+                results.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            answer = weighted[-1][0]
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    answer = value
+                    break
+            results.append(answer)
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the approximate value at quantile ``q``."""
+
+        return self.quantiles([q])[0]
+
+    def to_dict(self) -> Dict[str, object]:
+        """Serialize to a JSON-friendly mapping."""
+
+        return {
+            "type": SKETCH_TYPE,
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "offset": self._offset,
+            "compactors": [sorted(items) for items in self.compactors],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, object]) -> "KLLSketch":
+        """Rebuild a sketch previously produced by :meth:`to_dict`."""
+
+        if payload.get("type", SKETCH_TYPE) != SKETCH_TYPE:
+            raise ValueError(f"Unsupported sketch type: {payload.get('type')}")
+        sketch = cls(k=int(payload["k"]))
+        sketch.n = int(payload["n"])
+        sketch.min = None if payload.get("min") is None else float(payload["min"])
+        sketch.max = None if payload.get("max") is None else float(payload["max"])
+        sketch.compactors = [
+            [float(value) for value in items] for items in payload["compactors"]
+        ] or [[]]
+        sketch._offset = int(payload.get("offset", 0)) & 1
+        return sketch
@@ -1,8 +1,121 @@
 """Lightweight data validation for the NYC rent pipeline."""
 
+import random
+import tempfile
+from pathlib import Path
+
 import pandas as pd
 
+import derive
+from sketches import KLLSketch
+
 SOURCE = "data/nyc_median_rent.csv"
+SKETCH_MAX_RANK_ERROR = 0.02
+
+
+def check_sketches() -> None:
+    """Build, merge, and round-trip KLL sketches against known data."""
+
+    rng = random.Random(2024)
+    values = [rng.lognormvariate(7.8, 0.4) for _ in range(60_000)]
+    parts = [KLLSketch() for _ in range(6)]
+    for idx, part in enumerate(parts):
+        part.update_many(values[idx::6])
+
+    merged = KLLSketch()
+    for part in parts:
+        merged.merge(KLLSketch.from_dict(part.to_dict()))
+
+    if merged.n != len(values):
+        raise ValueError("KLL sketch merge lost observations")
+    weight = sum(len(items) << level for level, items in enumerate(merged.compactors))
+    if weight != merged.n:
+        raise ValueError("KLL sketch compaction did not conserve weight")
+    if merged.quantile(0) != min(values) or merged.quantile(1) != max(values):
+        raise ValueError("KLL sketch min/max drifted")
+
+    ordered = sorted(values)
+    for q in (0.1, 0.25, 0.5, 0.75, 0.9):
+        estimate = merged.quantile(q)
+        rank = sum(1 for value in ordered if value <= estimate) / len(ordered)
+        if abs(rank - q) > SKETCH_MAX_RANK_ERROR:
+            raise ValueError(f"KLL sketch rank error too large at q={q}: {rank:.4f}")
+
+    # Reloading must not change how later updates compact.
+    reloaded = KLLSketch.from_dict(merged.to_dict())
+    extra = values[:5_000]
+    merged.update_many(extra)
+    reloaded.update_many(extra)
+    if merged.to_dict() != reloaded.to_dict():
+        raise ValueError("KLL sketch diverged after to_dict/from_dict round-trip")
+
+
+# Row order matters: with chunksize=4 the last chunk holds only invalid rows.
+LISTINGS_FIXTURE = """year,month,borough,rent
+2023,1,Bronx,1500
+2023,1,Bronx,1700
+2023,1,Brooklyn,2500
+2023,2,Bronx,1600
+2023,,Bronx,1500
+2023,13,Bronx,1500
+2023.5,1,Bronx,1500
+2023,1,,1500
+2023,1,Bronx,inf
+2023,1,Bronx,-5
+2023,1,Bronx,0
+2023,1,Bronx,abc
+"""
+
+YEARLY_FIXTURE = """year,borough,rent
+2023,Bronx,1800
+2023,Bronx,1900
+2024,Queens,2400
+"""
+
+
+def check_listing_sketches() -> None:
+    """Exercise ingest filtering, re-ingest semantics, and rollups on fixture CSVs."""
+
+    with tempfile.TemporaryDirectory() as tmp:
+        monthly_path = Path(tmp) / "monthly.csv"
+        monthly_path.write_text(LISTINGS_FIXTURE, encoding="utf-8")
+        yearly_path = Path(tmp) / "yearly.csv"
+        yearly_path.write_text(YEARLY_FIXTURE, encoding="utf-8")
+
+        monthly = derive.build_rent_sketches(monthly_path, chunksize=4)
+        counts = {key: sketch.n for key, sketch in monthly.items()}
+        if counts != {("Bronx", "2023-01"): 2, ("Brooklyn", "2023-01"): 1, ("Bronx", "2023-02"): 1}:
+            raise ValueError(f"Listing ingest kept unexpected rows: {counts}")
+
+        stored = derive.update_rent_sketches({}, monthly)
+        again = derive.update_rent_sketches(stored, derive.build_rent_sketches(monthly_path, chunksize=4))
+        if sum(sketch.n for sketch in again.values()) != 4:
+            raise ValueError("Re-ingesting the same periods double-counted listings")
+
+        yearly = derive.build_rent_sketches(yearly_path)
+        replaced = derive.update_rent_sketches(again, yearly)
+        if sorted(replaced) != [("Bronx", "2023"), ("Brooklyn", "2023-01"), ("Queens", "2024")]:
+            raise ValueError(f"Yearly ingest did not replace monthly history: {sorted(replaced)}")
+        try:
+            derive.update_rent_sketches(replaced, monthly)
+        except ValueError:
+            pass
+        else:
+            raise ValueError("Monthly ingest over a stored yearly sketch was not rejected")
+
+        distribution = derive.compute_distribution_disparity(replaced)
+        if distribution["2023"]["citywide"]["n"] != 3 or distribution["2023"]["median_spread"] is None:
+            raise ValueError("2023 rollup does not combine yearly and monthly boroughs")
+        single = distribution["2024"]
+        if single["median_spread"] is not None or single["iqr_disparity"] is not None:
+            raise ValueError("Between-borough metrics must be None when one borough reports")
+
+        sketch_path = Path(tmp) / "sketches.json"
+        derive.write_json(sketch_path, derive.sketches_payload(replaced, ["a.csv", "b.csv", "a.csv"]))
+        reloaded, sources = derive.load_rent_sketches(sketch_path)
+        if sources != ["a.csv", "b.csv"] or sorted(reloaded) != sorted(replaced):
+            raise ValueError("Sketch payload did not round-trip groups and sources")
+
 
 
 def main() -> None:
@@ -36,13 +149,19 @@ def main() -> None:
     import json
     import pathlib
 
-    for path_str in ["data/derived_summary.json", "data/viz_payload.json"]:
+    for path_str in ["data/derived_summary.json", "data/viz_payload.json", "data/rent_sketches.json"]:
         path_obj = pathlib.Path(path_str)
         if path_obj.exists():
             json.loads(path_obj.read_text(encoding="utf-8"))
 
     print("[validate] json round-trip OK")
 
+    check_sketches()
+    print("[validate] quantile sketch self-check OK")
+
+    check_listing_sketches()
+    print("[validate] listing sketch ingest/rollup checks OK")
+
 
 if __name__ == "__main__":
     main()